@@ -1,76 +1,272 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import contextlib
+import functools
+import hashlib
+import http.client
 import json
+import math
 import os
-import re
+import shlex
+import shutil
+import sqlite3
 import subprocess
 import sys
+import threading
+from array import array
+from collections import deque
+from urllib.parse import urlsplit
 
-# Store command execution history
-command_history = []
+try:
+    import readline  # noqa: F401 -- enables line editing in input()
+except ImportError:
+    pass
 
+# orjson decodes noticeably faster when installed; its errors subclass json.JSONDecodeError
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Store the most recent (command, status) pairs
+command_history = deque(maxlen=5)
+
+# Characters that need /bin/sh to interpret (pipes, redirects, globs, expansions, comments, ...)
+SHELL_CHARS = frozenset("|&;<>()$`*?[]{}~#\\\n")
+
+# Ollama HTTP API; connections (one per thread) are kept open and the model kept resident between calls
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434")
+OLLAMA_MODEL = "llama3.2:latest"
+KEEP_ALIVE = "30m"
+_local = threading.local()
+# Errors raised when talking to Ollama fails (connection, HTTP status, malformed response)
+OLLAMA_ERRORS = (http.client.HTTPException, OSError, ValueError)
+
+# Prompt sent to Ollama, filled in with str.format_map
+PROMPT_TEMPLATE = """
+You are a command-line assistant helping users execute shell commands efficiently.
+The user is running a system with the following specifications:
+{sys_info}
+
+Previous command history:
+{history}
+
+Generate a single valid shell command based on the following query:
+"{query}"
+
+If a previous command failed, correct the mistake in your response.
+
+Respond in JSON format as:
+[
+    {{"command": "actual_command_here"}}
+]
+"""
+
+# Local response cache (exact hash match, then semantic match on query embeddings)
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "nlsh")
+CACHE_DB = os.path.join(CACHE_DIR, "exact.sqlite")
+EMBED_MODEL = "nomic-embed-text"
+SEMANTIC_THRESHOLD = 0.9
+
+@functools.lru_cache(maxsize=1)
 def get_system_info():
     """
     Gather basic system information and return it as a formatted string.
     """
     try:
-        os_name = subprocess.run(["uname", "-o"], capture_output=True, text=True).stdout.strip()
-        kernel = subprocess.run(["uname", "-r"], capture_output=True, text=True).stdout.strip()
-        arch = subprocess.run(["uname", "-m"], capture_output=True, text=True).stdout.strip()
+        uname = os.uname()
         package_manager = "dnf" if os.path.exists("/usr/bin/dnf") else "apt-get"
-        return f"OS: {os_name}; Kernel: {kernel}; Arch: {arch}; Package Manager: {package_manager}"
+        return f"OS: {uname.sysname}; Kernel: {uname.release}; Arch: {uname.machine}; Package Manager: {package_manager}"
     except Exception as e:
         return f"Error gathering system info: {e}"
 
+@functools.lru_cache(maxsize=1)
+def _path_executables():
+    """
+    Returns the names of all files in the PATH directories, scanned once per run.
+    """
+    names = set()
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        try:
+            names.update(os.listdir(directory or "."))
+        except OSError:
+            pass
+    return names
+
 def command_exists(command):
     """
-    Check if a command exists using 'command -v'.
+    Check if the command's program is on the PATH (or is an executable path).
     """
-    cmd = command.split()[0]
-    result = subprocess.run(["command", "-v", cmd], capture_output=True, text=True)
-    return result.returncode == 0
+    parts = command.split(maxsplit=1)
+    if not parts:
+        return False
+    cmd = parts[0]
+    return cmd in _path_executables() or shutil.which(cmd) is not None
 
 def is_command_valid(command):
     """
-    Validate the command by checking its existence and testing --help.
+    Validate the command without running anything: it must be non-empty and its program must exist.
     """
-    cmd_parts = command.split()
-    if len(cmd_parts) > 1:
-        try:
-            result = subprocess.run([cmd_parts[0], "--help"], capture_output=True, text=True)
-            return result.returncode == 0
-        except Exception:
-            return False
-    return True
+    return bool(command.strip()) and "\0" not in command and command_exists(command)
+
+def is_command_array(value):
+    """
+    Checks that a decoded JSON value looks like the model's answer: a non-empty array
+    of command objects or strings (as opposed to e.g. a "[1]" footnote in prose).
+    """
+    return isinstance(value, list) and bool(value) and all(isinstance(item, (dict, str)) for item in value)
+
+class JsonArrayScanner:
+    """
+    Incrementally scans text for the first top-level JSON array of commands, skipping
+    brackets inside string literals. Text can be fed in chunks; each element object is
+    reported as soon as its closing brace arrives, and `array` holds the decoded array
+    once it has closed. The text is walked exactly once, even around stray brackets in prose.
+    """
+    def __init__(self):
+        self.text = ""
+        self.array = None
+        self._pos = 0
+        self._stack = []        # positions of the currently open '[' and '{'
+        self._braces = 0        # how many of those are '{'
+        self._candidates = []   # (start, end) of outermost closed arrays that may hold commands
+        self._in_str = False
+        self._esc = False
+
+    def feed(self, chunk):
+        """
+        Appends chunk to the scanned text and returns the element objects completed by it.
+        """
+        self.text += chunk
+        s = self.text
+        completed = []
+        stack, candidates = self._stack, self._candidates
+        pos, braces, in_str, esc = self._pos, self._braces, self._in_str, self._esc
+        while pos < len(s) and self.array is None:
+            c = s[pos]
+            pos += 1
+            if not stack:
+                if c == "[":
+                    stack.append(pos - 1)
+            elif in_str:
+                if esc:
+                    esc = False
+                elif c == "\\":
+                    esc = True
+                elif c == '"':
+                    in_str = False
+            elif c == '"':
+                in_str = True
+            elif c == "[":
+                stack.append(pos - 1)
+            elif c == "{":
+                stack.append(pos - 1)
+                braces += 1
+            elif c == "}":
+                if s[stack[-1]] != "{":
+                    continue  # unbalanced prose; ignore
+                start = stack.pop()
+                braces -= 1
+                if braces == 0 and s[stack[-1]] == "[":
+                    try:
+                        completed.append(json_loads(s[start:pos]))
+                    except (ValueError, RecursionError):
+                        pass
+            elif c == "]":
+                if s[stack[-1]] != "[":
+                    continue  # unbalanced prose; ignore
+                start = stack.pop()
+                # Only spans starting with an object or string can be a command array;
+                # this skips decoding footnotes, empty arrays and nested lists
+                first = start + 1
+                while s[first] in " \t\r\n":
+                    first += 1
+                if s[first] in '{"':
+                    # Spans recorded after start are nested in this one; only the outermost
+                    # is kept, so each character is decoded at most once
+                    while candidates and candidates[-1][0] > start:
+                        candidates.pop()
+                    candidates.append((start, pos))
+                if not stack:
+                    # Back at top level: the first command array since the last '[' is the answer
+                    in_str = esc = False
+                    self._decode_candidates()
+        self._pos, self._braces, self._in_str, self._esc = pos, braces, in_str, esc
+        return completed
+
+    def finish(self):
+        """
+        Called once all text has been fed. If a stray '[' in prose is still open, the first
+        command array found inside it is the answer.
+        """
+        if self.array is None:
+            self._decode_candidates()
+
+    def _decode_candidates(self):
+        """
+        Sets `array` to the first recorded span that decodes to a command array, then clears the spans.
+        """
+        for start, end in self._candidates:
+            try:
+                value = json_loads(self.text[start:end])
+            except (ValueError, RecursionError):
+                continue
+            if is_command_array(value):
+                self.array = value
+                break
+        self._candidates.clear()
 
 def extract_json_array(raw_output):
     """
     Extracts a JSON array from raw_output if present.
     """
-    try:
-        # Use regex to extract only the JSON portion
-        match = re.search(r"\[\s*{.*?}\s*\]", raw_output, re.DOTALL)
-        if match:
-            return json.loads(match.group(0))
-        else:
-            print("⚠️ No valid JSON found. Treating as plaintext command.", file=sys.stderr)
-            return None
-    except json.JSONDecodeError:
-        print("❌ JSON Parsing Error: Could not decode valid JSON.", file=sys.stderr)
-        return None
+    # Fast path: well-behaved (or JSON-mode) output is nothing but the array itself
+    stripped = raw_output.strip()
+    if stripped[:1] == "[" and stripped[-1:] == "]":
+        try:
+            value = json_loads(stripped)
+        except json.JSONDecodeError:
+            value = None
+        if is_command_array(value):
+            return value
+
+    scanner = JsonArrayScanner()
+    scanner.feed(raw_output)
+    scanner.finish()
+    return scanner.array
 
-def process_output(raw_output):
+def normalize_commands(data):
+    """
+    Converts parsed model output into a list of {"command": ...} objects, dropping malformed entries.
+    """
+    if isinstance(data, dict):
+        data = [data]
+    commands = []
+    for item in data:
+        if isinstance(item, str):
+            item = {"command": item}
+        if isinstance(item, dict) and isinstance(item.get("command"), str):
+            commands.append(item)
+    return commands
+
+# Default for process_output's parsed argument, distinct from None ("looked, found no array")
+_NOT_PARSED = object()
+
+def process_output(raw_output, parsed=_NOT_PARSED):
     """
     Processes AI-generated commands and filters out invalid ones.
+    parsed is the JSON array already decoded by the caller, or None if the caller scanned the
+    output and found none; if omitted, the array is extracted from raw_output.
     """
-    commands = extract_json_array(raw_output)
-    if not commands:
+    if parsed is _NOT_PARSED:
+        parsed = extract_json_array(raw_output)
+    if not parsed:
         print("⚠️ No valid JSON found. Treating as plaintext command.", file=sys.stderr)
-        commands = [raw_output.strip()]
-    
-    if isinstance(commands, list) and all(isinstance(cmd, str) for cmd in commands):
-        commands = [{"command": cmd} for cmd in commands]
-    
+        parsed = [raw_output.strip()]
+
+    commands = normalize_commands(parsed)
     valid_commands = [cmd for cmd in commands if command_exists(cmd["command"])]
     
     if not valid_commands:
@@ -86,94 +282,350 @@ def present_menu(commands):
     print("\n📋 Available Commands:")
     for i, cmd_obj in enumerate(commands):
         print(f"{i+1}) {cmd_obj.get('command')}")
-    choice = input("\nSelect command number to execute (or q to quit): ").strip()
+    # The first command is usually the best one, so an empty answer selects it
+    choice = input(f"\nSelect command number to execute [1-{len(commands)}] (default 1, q to quit): ").strip() or "1"
     if choice.lower() == 'q':
         sys.exit(0)
-    try:
-        idx = int(choice) - 1
-        if idx < 0 or idx >= len(commands):
-            print("❌ Invalid selection.")
-            sys.exit(1)
-        return commands[idx]["command"]
-    except ValueError:
+    if not choice.isdecimal():
         print("❌ Invalid input. Exiting.")
         sys.exit(1)
+    idx = int(choice) - 1
+    if idx < 0 or idx >= len(commands):
+        print("❌ Invalid selection.")
+        sys.exit(1)
+    return commands[idx]["command"]
+
+def command_argv(command):
+    """
+    Splits a command into an argv list, or returns None if it needs a shell to run.
+    """
+    if not SHELL_CHARS.isdisjoint(command):
+        return None
+    try:
+        argv = shlex.split(command)
+    except ValueError:
+        return None
+    # Leading VAR=value assignments are also shell syntax
+    if not argv or "=" in argv[0]:
+        return None
+    return argv
 
 def execute_command(command):
     """
     Executes the selected command with safety checks and tracks history.
+    Returns True if the command ran and exited successfully.
     """
-    global command_history
     if not is_command_valid(command):
         print(f"⚠️ Skipping invalid command: {command}")
-        return
+        return False
     
-    print(f"\n➡️ Executing: {command}")
+    print(f"\n➡️ Executing: {command}", flush=True)
     try:
-        result = subprocess.run(command, shell=True, capture_output=True, text=True)
-        command_history.append({"command": command, "status": "success" if result.returncode == 0 else "failed", "output": result.stderr if result.returncode else result.stdout})
-        
-        if result.returncode == 0:
-            print(result.stdout)
+        # The command inherits our stdout/stderr, so its output streams straight to the terminal
+        argv = command_argv(command)
+        if argv:
+            result = subprocess.run(argv)
         else:
+            result = subprocess.run(command, shell=True)
+        command_history.append((command, "success" if result.returncode == 0 else "failed"))
+
+        if result.returncode != 0:
             print(f"⚠️ Command failed with exit code {result.returncode}: {command}")
-            print(result.stderr)
+        return result.returncode == 0
     except Exception as e:
-        command_history.append({"command": command, "status": "error", "output": str(e)})
+        command_history.append((command, "error"))
         print(f"⚠️ Error executing command: {e}")
+        return False
 
-def query_ollama(query):
+def ollama_post(path, payload):
     """
-    Generates shell commands using Ollama with system context and execution history.
+    POSTs a JSON payload to the Ollama HTTP API over a persistent keep-alive connection
+    and returns the (unread) HTTP response.
     """
-    sys_info = get_system_info()
+    body = json.dumps(payload)
+    for attempt in range(2):
+        if getattr(_local, "connection", None) is None:
+            url = urlsplit(OLLAMA_HOST if "://" in OLLAMA_HOST else f"http://{OLLAMA_HOST}")
+            _local.connection = http.client.HTTPConnection(url.hostname or "127.0.0.1", url.port or 11434, timeout=120)
+        try:
+            _local.connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            response = _local.connection.getresponse()
+            break
+        except (http.client.HTTPException, OSError):
+            # The server may have dropped an idle keep-alive connection; reconnect once
+            _local.connection.close()
+            _local.connection = None
+            if attempt:
+                raise
+    if response.status != 200:
+        data = response.read()
+        raise http.client.HTTPException(f"Ollama returned HTTP {response.status}: {data.decode(errors='replace').strip()}")
+    return response
 
+def ollama_request(path, payload):
+    """
+    POSTs a JSON payload to the Ollama HTTP API and returns the decoded JSON response.
+    """
+    return json_loads(ollama_post(path, payload).read())
+
+def ollama_stream(path, payload):
+    """
+    POSTs a streaming request to the Ollama HTTP API and yields each generated token.
+    """
+    response = ollama_post(path, dict(payload, stream=True))
+    try:
+        for line in response:
+            message = json_loads(line)
+            if "error" in message:
+                raise http.client.HTTPException(f"Ollama error: {message['error']}")
+            done = message.get("done")
+            if done:
+                # Read the terminating chunk so the keep-alive connection can be reused
+                response.read()
+            yield message.get("response", "")
+            if done:
+                break
+    finally:
+        if not response.isclosed():
+            # Stopped early: drop the connection so Ollama cancels the rest of the generation
+            _local.connection.close()
+            _local.connection = None
+
+def query_ollama(query, sys_info, json_format=False, on_command=None):
+    """
+    Generates shell commands using Ollama with system context and execution history.
+    The response is streamed; on_command is called with each command as soon as it has
+    been generated, and generation stops if the model goes on past the JSON array.
+    Returns the raw output and the decoded JSON array (None if none was found).
+    Raises one of OLLAMA_ERRORS if Ollama cannot be reached or reports an error.
+    """
     # Format command history into a readable context
-    history_context = "\n".join([f"- {entry['command']} (Status: {entry['status']})" for entry in command_history[-5:]])
+    history_context = "\n".join(f"- {command} (Status: {status})" for command, status in command_history)
+
+    full_prompt = PROMPT_TEMPLATE.format_map({
+        "query": query,
+        "sys_info": sys_info,
+        "history": history_context or "No previous commands",
+    })
+    payload = {"model": OLLAMA_MODEL, "prompt": full_prompt, "keep_alive": KEEP_ALIVE}
+    scanner = JsonArrayScanner()
+    if json_format:
+        # Constrained JSON output can be much slower to generate, so it is opt-in.
+        # JSON mode yields a single object rather than an array; wrap it for extraction.
+        payload["format"] = "json"
+        scanner.feed("[")
+    with contextlib.closing(ollama_stream("/api/generate", payload)) as tokens:
+        for token in tokens:
+            if scanner.array is not None:
+                # The command array is complete. Whitespace up to the "done" message is read
+                # so the keep-alive connection can be reused; anything else is trailing prose,
+                # so stop and let Ollama cancel the rest of the generation.
+                if token.strip():
+                    break
+                continue
+            for obj in scanner.feed(token):
+                if on_command and isinstance(obj, dict) and "command" in obj:
+                    on_command(obj["command"])
+    if json_format and scanner.array is None:
+        scanner.feed("]")
+    scanner.finish()
+    return scanner.text, scanner.array
+
+def open_cache():
+    """
+    Opens the local response cache, creating it if needed. Returns None if unavailable.
+    """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        cache = sqlite3.connect(CACHE_DB)
+        cache.execute("CREATE TABLE IF NOT EXISTS kv (hash TEXT PRIMARY KEY, sys_info TEXT, query TEXT, commands_json TEXT, embedding BLOB)")
+        # Caches created before the query column existed
+        if "query" not in {row[1] for row in cache.execute("PRAGMA table_info(kv)")}:
+            cache.execute("ALTER TABLE kv ADD COLUMN query TEXT")
+        return cache
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Response cache unavailable: {e}", file=sys.stderr)
+        return None
+
+def embed_query(query):
+    """
+    Computes a unit-length embedding of the query, or None if the embedding model is unavailable.
+    """
+    try:
+        response = ollama_request("/api/embed", {"model": EMBED_MODEL, "input": query, "keep_alive": KEEP_ALIVE})
+        vector = array("f", response["embeddings"][0])
+    except OLLAMA_ERRORS + (TypeError, KeyError, IndexError):
+        return None
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        return None
+    return array("f", (x / norm for x in vector))
+
+def find_similar(cache, sys_info, embedding):
+    """
+    Finds the cached entry whose query embedding is most similar to the given one, provided
+    the cosine similarity exceeds SEMANTIC_THRESHOLD. Returns (hash, query, commands, score) or None.
+    """
+    best_score, best_row = SEMANTIC_THRESHOLD, None
+    rows = cache.execute("SELECT hash, query, commands_json, embedding FROM kv WHERE sys_info = ? AND embedding IS NOT NULL", (sys_info,))
+    for key, query, commands_json, blob in rows:
+        cached = array("f")
+        cached.frombytes(blob)
+        if len(cached) != len(embedding):
+            continue
+        # Both vectors are stored normalized, so the dot product is the cosine similarity
+        score = sum(a * b for a, b in zip(embedding, cached))
+        if score > best_score:
+            best_score, best_row = score, (key, query, commands_json)
+    if best_row is None:
+        return None
+    key, query, commands_json = best_row
+    return key, query, json_loads(commands_json), best_score
 
-    full_prompt = f"""
-    You are a command-line assistant helping users execute shell commands efficiently.
-    The user is running a system with the following specifications:
-    {sys_info}
+def forget_cached(key):
+    """
+    Deletes a cache entry, e.g. because the command it suggested failed.
+    """
+    cache = open_cache()
+    if not cache:
+        return
+    try:
+        cache.execute("DELETE FROM kv WHERE hash = ?", (key,))
+        cache.commit()
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not update response cache: {e}", file=sys.stderr)
+    finally:
+        cache.close()
 
-    Previous command history:
-    {history_context if history_context else "No previous commands"}
+def cached_query_ollama(query, sys_info, json_format=False, quiet=False, refresh=False):
+    """
+    Returns validated commands for the query, consulting the local cache before calling Ollama,
+    along with the key of the cache entry they came from or were stored under (None if not cached),
+    so the entry can be dropped if the chosen command fails. With refresh set, the cache is not
+    consulted and the entry is overwritten. With quiet set, progress and raw output are not printed.
+    """
+    log = (lambda *args: None) if quiet else print
+    key = hashlib.sha256(f"{sys_info}\n{query}".encode()).hexdigest()
+    cache = open_cache()
+    embedding = None
+    try:
+        if cache:
+            try:
+                row = None if refresh else cache.execute("SELECT commands_json FROM kv WHERE hash = ?", (key,)).fetchone()
+                if row:
+                    log("⚡ Using cached commands (exact match).")
+                    return json_loads(row[0]), key
+                embedding = embed_query(query)
+                match = find_similar(cache, sys_info, embedding) if embedding and not refresh else None
+                if match:
+                    match_key, match_query, commands, score = match
+                    # Always shown, even in batch mode: the commands were generated for a different query
+                    print(f'⚡ Reusing cached commands for "{match_query or "an earlier query"}" '
+                          f'(similarity {score:.2f}) to answer "{query}". Use --refresh to regenerate.')
+                    return commands, match_key
+            except sqlite3.Error as e:
+                print(f"⚠️ Response cache error: {e}", file=sys.stderr)
+
+        log("\n⏳ Generating commands...")
+        raw_output, parsed = query_ollama(query, sys_info, json_format, on_command=lambda cmd: log(f"   • {cmd}"))
+        log("\n📝 Raw output from Ollama:\n", raw_output)
+
+        commands = process_output(raw_output, parsed)
+        if commands and cache:
+            try:
+                cache.execute(
+                    "INSERT OR REPLACE INTO kv (hash, sys_info, query, commands_json, embedding) VALUES (?, ?, ?, ?, ?)",
+                    (key, sys_info, query, json.dumps(commands), embedding.tobytes() if embedding else None),
+                )
+                cache.commit()
+                return commands, key
+            except sqlite3.Error as e:
+                # The commands are still good; they just won't be cached
+                print(f"⚠️ Could not write to response cache: {e}", file=sys.stderr)
+        return commands, None
+    finally:
+        if cache:
+            cache.close()
+
+async def aquery_ollama(query, sys_info, json_format=False, refresh=False):
+    """
+    Generates validated commands for the query without blocking the event loop, returning
+    the same (commands, cache key) pair as cached_query_ollama. The request runs in a worker
+    thread with its own Ollama connection.
+    Returns (None, None) if Ollama fails, so one bad query does not cancel the rest of a batch.
+    """
+    try:
+        return await asyncio.to_thread(cached_query_ollama, query, sys_info, json_format, quiet=True, refresh=refresh)
+    except OLLAMA_ERRORS as e:
+        print(f"❌ Failed to get output from Ollama for '{query}': {e}", file=sys.stderr)
+        return None, None
 
-    Generate a single valid shell command based on the following query:
-    "{query}"
+async def query_batch(queries, sys_info, json_format=False, refresh=False):
+    """
+    Generates commands for all queries concurrently, returning the results in order.
+    """
+    return await asyncio.gather(*(aquery_ollama(query, sys_info, json_format, refresh) for query in queries))
 
-    If a previous command failed, correct the mistake in your response.
+def run_selected(commands, cache_key):
+    """
+    Lets the user pick one of the commands and runs it. If it fails, the cache entry the
+    commands came from is dropped so the next run asks the model again.
+    """
+    if not execute_command(present_menu(commands)) and cache_key:
+        forget_cached(cache_key)
 
-    Respond in JSON format as:
-    [
-        {{"command": "actual_command_here"}}
-    ]
+def run_batch(path, sys_info, json_format=False, refresh=False):
+    """
+    Generates commands for each query in the file in parallel, then presents a menu for each in turn.
     """
     try:
-        result = subprocess.run(["ollama", "run", "llama3.2:latest"], input=full_prompt, text=True, capture_output=True, check=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        print("❌ Failed to get output from Ollama.", file=sys.stderr)
+        with open(path) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    except OSError as e:
+        print(f"❌ Could not read batch file: {e}", file=sys.stderr)
         sys.exit(1)
 
+    print(f"\n⏳ Generating commands for {len(queries)} queries...")
+    results = asyncio.run(query_batch(queries, sys_info, json_format, refresh))
+    for query, (commands, cache_key) in zip(queries, results):
+        print(f"\n🔎 Query: {query}")
+        if not commands:
+            print("❌ No valid commands found.", file=sys.stderr)
+            continue
+        run_selected(commands, cache_key)
+
 def main():
-    parser = argparse.ArgumentParser(description="Natural Language Shell Helper using Ollama")
-    parser.add_argument("query", nargs="+", help="The natural language query to generate shell commands for")
+    parser = argparse.ArgumentParser(
+        description="Natural Language Shell Helper using Ollama",
+        epilog="Tip: start the Ollama server with OLLAMA_NUM_PARALLEL=4 so --batch queries are generated in parallel.",
+    )
+    parser.add_argument("query", nargs="*", help="The natural language query to generate shell commands for")
+    parser.add_argument("--json-format", action="store_true", help="Constrain Ollama to JSON output (more reliable parsing, slower generation)")
+    parser.add_argument("--batch", metavar="FILE", help="Read queries from FILE (one per line) and generate commands for all of them concurrently")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached commands and regenerate them, overwriting the cache entry")
     args = parser.parse_args()
+    if not args.query and not args.batch:
+        parser.error("a query or --batch FILE is required")
 
-    query = " ".join(args.query)
-    print("🔍 System info:", get_system_info())
+    sys_info = get_system_info()
+    print("🔍 System info:", sys_info)
+
+    if args.batch:
+        run_batch(args.batch, sys_info, args.json_format, args.refresh)
+        return
 
-    raw_output = query_ollama(query)
-    print("\n📝 Raw output from Ollama:\n", raw_output)
+    query = " ".join(args.query)
 
-    commands = process_output(raw_output)
+    try:
+        commands, cache_key = cached_query_ollama(query, sys_info, args.json_format, refresh=args.refresh)
+    except OLLAMA_ERRORS as e:
+        print(f"❌ Failed to get output from Ollama: {e}", file=sys.stderr)
+        sys.exit(1)
     if not commands:
         print("❌ No valid commands found.", file=sys.stderr)
         sys.exit(1)
 
-    selected_command = present_menu(commands)
-    execute_command(selected_command)
+    run_selected(commands, cache_key)
 
 if __name__ == "__main__":
     main()